@@ -2,7 +2,9 @@ import base64
 import json
 import logging
 import os
+import queue
 import re
+import threading
 
 import boto3
 
@@ -186,6 +188,56 @@ class DynamoClient:
                 yield item
             last_key = resp.get('LastEvaluatedKey')
 
+    def generate_all_query_prefetched(self, query_kwargs, prefetch_pages=2):
+        """
+        Return a generator that iterates over all results of the query.
+        Up to `prefetch_pages` pages are fetched in a background thread while the
+        caller processes the current one, overlapping network time with processing.
+        """
+        page_queue = queue.Queue(maxsize=prefetch_pages)
+        abandoned = threading.Event()
+
+        def put_entry(entry):
+            "Returns False if the consumer abandoned the generator before taking the entry"
+            while not abandoned.is_set():
+                try:
+                    page_queue.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def fetch_pages():
+            try:
+                # boto3 resources are not thread-safe, so this thread gets its own
+                # table handle rather than sharing self.table with the consumer
+                table = boto3.session.Session().resource('dynamodb').Table(self.table_name)
+                last_key = False
+                while last_key is not None:
+                    start_kwargs = {'ExclusiveStartKey': last_key} if last_key else {}
+                    resp = table.query(**query_kwargs, **start_kwargs)
+                    if not put_entry(('page', resp['Items'])):
+                        return
+                    last_key = resp.get('LastEvaluatedKey')
+                put_entry(('done', None))
+            except BaseException as err:
+                put_entry(('error', err))
+
+        threading.Thread(target=fetch_pages, daemon=True).start()
+        try:
+            while True:
+                kind, value = page_queue.get()
+                if kind == 'error':
+                    raise value
+                if kind == 'done':
+                    return
+                for item in value:
+                    yield item
+        finally:
+            # runs on GeneratorExit as well, so a consumer that breaks out of its
+            # loop doesn't leave the producer thread blocked on a full queue
+            abandoned.set()
+
     def generate_all_scan(self, scan_kwargs):
         "Return a generator that iterates over all results of the scan"
         last_key = False
@@ -1,12 +1,67 @@
+import datetime
+import functools
 import logging
-from decimal import Decimal
+import random
+import time
+import uuid
+from decimal import ROUND_HALF_EVEN, Context, Decimal
 
-import pendulum
+from botocore.exceptions import ClientError
 
 from . import exceptions
 
 logger = logging.getLogger()
 
+# reused for all score quantization so each call avoids building a fresh context
+_quantize_context = Context(prec=28, rounding=ROUND_HALF_EVEN)
+
+_throttled_error_codes = ('ProvisionedThroughputExceededException', 'ThrottlingException')
+
+
+def _retry_throttled(max_attempts=5, base_delay=0.05, max_delay=10.0):
+    """
+    Retry DynamoDB throttling errors with capped exponential backoff and full jitter.
+    Other errors, notably ConditionalCheckFailedException, propagate immediately.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts):
+                try:
+                    return method(*args, **kwargs)
+                except ClientError as err:
+                    if err.response['Error']['Code'] not in _throttled_error_codes:
+                        raise
+                    if attempt + 1 == max_attempts:
+                        raise
+                    delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                    logger.warning(f'Throttled by dynamo in `{method.__name__}`, retrying in {delay:.3f}s')
+                    time.sleep(delay)
+
+        return wrapper
+
+    return decorator
+
+
+def _to_iso8601(dt):
+    "Format a pendulum or stdlib datetime as ISO-8601, with a Z suffix for UTC as pendulum produces"
+    if hasattr(dt, 'to_iso8601_string'):
+        return dt.to_iso8601_string()
+    return dt.isoformat(timespec='microseconds').replace('+00:00', 'Z')
+
+
+def _quantize_score(score, percision):
+    "Quantize `score` to `percision`, stripping trailing zeros without a second pass through normalize()"
+    quantized = _quantize_context.quantize(score, percision)
+    sign, digits, exponent = quantized.as_tuple()
+    if digits == (0,):
+        return Decimal(0)
+    while exponent < 0 and digits[-1] == 0:
+        digits = digits[:-1]
+        exponent += 1
+    return Decimal((sign, digits, exponent))
+
 
 class TrendingDynamo:
 
@@ -15,53 +70,94 @@ class TrendingDynamo:
     def __init__(self, item_type, dynamo_client):
         self.item_type = item_type
         self.client = dynamo_client
+        # precomputed once per instance: pk() and the GSI-A4 partition key are on every hot path
+        self._pk_prefix = f'{item_type}/'
+        self._gsi_a4_pk = f'{item_type}/trending'
+        # template for add(): a dict.copy() is cheaper than re-building the literal per call
+        self._add_item_template = {
+            'partitionKey': None,
+            'sortKey': 'trending',
+            'schemaVersion': 0,
+            'gsiA4PartitionKey': self._gsi_a4_pk,
+            'gsiA4SortKey': None,
+            'lastDeflatedAt': None,
+            'createdAt': None,
+            'clientToken': None,
+        }
 
     def pk(self, item_id):
         return {
-            'partitionKey': f'{self.item_type}/{item_id}',
+            'partitionKey': self._pk_prefix + item_id,
             'sortKey': 'trending',
         }
 
     def get(self, item_id, strongly_consistent=False):
         return self.client.get_item(self.pk(item_id), ConsistentRead=strongly_consistent)
 
+    @_retry_throttled()
     def add(self, item_id, initial_score, now=None):
         assert isinstance(initial_score, Decimal), 'Boto uses decimals for numbers'
         assert initial_score >= 0, 'Score cannot be negative'
-        now = now or pendulum.now('utc')
-        now_str = now.to_iso8601_string()
-        query_kwargs = {
-            'Item': {
-                **self.pk(item_id),
-                'schemaVersion': 0,
-                'gsiA4PartitionKey': f'{self.item_type}/trending',
-                'gsiA4SortKey': initial_score.quantize(self.PERCISION).normalize(),
-                'lastDeflatedAt': now_str,
-                'createdAt': now_str,
-            },
-        }
+        # stdlib datetime.now() is an order of magnitude cheaper than pendulum.now()
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        now_str = _to_iso8601(now)
+        token = uuid.uuid4().hex
+        item = self._add_item_template.copy()
+        item['partitionKey'] = self._pk_prefix + item_id
+        item['gsiA4SortKey'] = _quantize_score(initial_score, self.PERCISION)
+        item['lastDeflatedAt'] = now_str
+        item['createdAt'] = now_str
+        item['clientToken'] = token
+        query_kwargs = {'Item': item}
         try:
             return self.client.add_item(query_kwargs)
         except self.client.exceptions.ConditionalCheckFailedException as err:
+            # an earlier attempt may have succeeded server-side but timed out client-side:
+            # in that case the existing item carries our token and this is not a true conflict
+            existing = self.get(item_id, strongly_consistent=True)
+            if existing and existing.get('clientToken') == token:
+                return existing
             raise exceptions.TrendingAlreadyExists(self.item_type, item_id) from err
 
+    @_retry_throttled()
     def add_score(self, item_id, score_to_add, expected_last_deflated_at):
+        "`expected_last_deflated_at` may be passed pre-formatted as a string to skip re-formatting"
         assert isinstance(score_to_add, Decimal), 'Boto uses decimals for numbers'
         assert score_to_add >= 0, 'Score cannot be negative'
+        if not isinstance(expected_last_deflated_at, str):
+            expected_last_deflated_at = _to_iso8601(expected_last_deflated_at)
+        token = uuid.uuid4().hex
         query_kwargs = {
             'Key': self.pk(item_id),
-            'UpdateExpression': 'ADD gsiA4SortKey :sta',
+            'UpdateExpression': 'ADD gsiA4SortKey :sta SET lastWriteToken = :lwt',
             'ConditionExpression': 'lastDeflatedAt = :elda',
             'ExpressionAttributeValues': {
-                ':sta': score_to_add.quantize(self.PERCISION).normalize(),
-                ':elda': expected_last_deflated_at.to_iso8601_string(),
+                ':sta': _quantize_score(score_to_add, self.PERCISION),
+                ':elda': expected_last_deflated_at,
+                ':lwt': token,
             },
         }
         try:
             return self.client.update_item(query_kwargs)
         except self.client.exceptions.ConditionalCheckFailedException as err:
-            raise exceptions.TrendingDNEOrAttributeMismatch(self.item_type, item_id) from err
+            # as in add(), distinguish a lost response to our own write from a true mismatch
+            existing = self.get(item_id, strongly_consistent=True)
+            if existing and existing.get('lastWriteToken') == token:
+                return existing
+            actual = existing.get('lastDeflatedAt') if existing else None
+            logger.warning(
+                f'Trending add_score conditional failure for `{self.item_type}:{item_id}`: '
+                f'expected lastDeflatedAt `{expected_last_deflated_at}`, found `{actual}`'
+            )
+            raise exceptions.TrendingDNEOrAttributeMismatch(
+                self.item_type,
+                item_id,
+                attribute_name='lastDeflatedAt',
+                expected_value=expected_last_deflated_at,
+                actual_value=actual,
+            ) from err
 
+    @_retry_throttled()
     def deflate_score(self, item_id, expected_score, new_score, expected_last_deflation_date, now):
         assert isinstance(expected_score, Decimal), 'Boto uses decimals for numbers'
         assert isinstance(new_score, Decimal), 'Boto uses decimals for numbers'
@@ -73,18 +169,34 @@ class TrendingDynamo:
             'ConditionExpression': 'gsiA4SortKey = :es AND begins_with(lastDeflatedAt, :eldd)',
             'ExpressionAttributeValues': {
                 ':es': expected_score,  # no normalization because must match exactly
-                ':ns': new_score.quantize(self.PERCISION).normalize(),
-                ':lda': now.to_iso8601_string(),
+                ':ns': _quantize_score(new_score, self.PERCISION),
+                ':lda': _to_iso8601(now),
                 ':eldd': str(expected_last_deflation_date),
             },
         }
         try:
             return self.client.update_item(query_kwargs)
         except self.client.exceptions.ConditionalCheckFailedException as err:
-            raise exceptions.TrendingDNEOrAttributeMismatch(self.item_type, item_id) from err
+            existing = self.get(item_id, strongly_consistent=True)
+            actual = existing.get('gsiA4SortKey') if existing else None
+            logger.warning(
+                f'Trending deflate_score conditional failure for `{self.item_type}:{item_id}`: '
+                f'expected gsiA4SortKey `{expected_score}`, found `{actual}`'
+            )
+            raise exceptions.TrendingDNEOrAttributeMismatch(
+                self.item_type,
+                item_id,
+                attribute_name='gsiA4SortKey',
+                expected_value=expected_score,
+                actual_value=actual,
+            ) from err
 
+    @_retry_throttled()
     def delete(self, item_id, expected_score=None):
-        if expected_score is not None:
+        try:
+            # fast path: unconditional deletes skip the kwargs dict and ** unpack altogether
+            if expected_score is None:
+                return self.client.delete_item(self.pk(item_id))
             assert isinstance(expected_score, Decimal), 'Boto uses decimals for numbers'
             kwargs = {
                 'ConditionExpression': 'gsiA4SortKey = :es',
@@ -92,18 +204,38 @@ class TrendingDynamo:
                     ':es': expected_score,  # no normalization because must match exactly
                 },
             }
-        else:
-            kwargs = {}
-        try:
             return self.client.delete_item(self.pk(item_id), **kwargs)
         except self.client.exceptions.ConditionalCheckFailedException as err:
-            raise exceptions.TrendingDNEOrAttributeMismatch(self.item_type, item_id) from err
+            existing = self.get(item_id, strongly_consistent=True)
+            actual = existing.get('gsiA4SortKey') if existing else None
+            logger.warning(
+                f'Trending delete conditional failure for `{self.item_type}:{item_id}`: '
+                f'expected gsiA4SortKey `{expected_score}`, found `{actual}`'
+            )
+            raise exceptions.TrendingDNEOrAttributeMismatch(
+                self.item_type,
+                item_id,
+                attribute_name='gsiA4SortKey',
+                expected_value=expected_score,
+                actual_value=actual,
+            ) from err
 
     def generate_items(self):
-        "Ordered with lowest score first."
+        "Ordered with lowest score first. Pages are prefetched while the caller processes each one."
+        query_kwargs = {
+            'KeyConditionExpression': 'gsiA4PartitionKey = :gsia1pk',
+            'ExpressionAttributeValues': {':gsia1pk': self._gsi_a4_pk},
+            'IndexName': 'GSI-A4',
+        }
+        return self.client.generate_all_query_prefetched(query_kwargs)
+
+    def generate_keys(self):
+        "Only primary key and GSI-A4 attributes. Ordered with lowest score first."
         query_kwargs = {
             'KeyConditionExpression': 'gsiA4PartitionKey = :gsia1pk',
-            'ExpressionAttributeValues': {':gsia1pk': f'{self.item_type}/trending'},
+            'ExpressionAttributeValues': {':gsia1pk': self._gsi_a4_pk},
             'IndexName': 'GSI-A4',
+            'ProjectionExpression': 'partitionKey, sortKey, gsiA4PartitionKey, gsiA4SortKey',
+            'Select': 'SPECIFIC_ATTRIBUTES',
         }
-        return self.client.generate_all_query(query_kwargs)
+        return self.client.generate_all_query_prefetched(query_kwargs)
@@ -12,9 +12,15 @@ class TrendingAlreadyExists(TrendingException):
 
 
 class TrendingDNEOrAttributeMismatch(TrendingException):
-    def __init__(self, item_type, item_id):
+    def __init__(self, item_type, item_id, attribute_name=None, expected_value=None, actual_value=None):
         self.item_type = item_type
         self.item_id = item_id
+        self.attribute_name = attribute_name
+        self.expected_value = expected_value
+        self.actual_value = actual_value
 
     def __str__(self):
-        return f'Trending for `{self.item_type}:{self.item_id}` DNE or does not have expected attributes'
+        msg = f'Trending for `{self.item_type}:{self.item_id}` DNE or does not have expected attributes'
+        if self.attribute_name:
+            msg += f': expected `{self.attribute_name}` of `{self.expected_value}`, found `{self.actual_value}`'
+        return msg
@@ -69,7 +69,8 @@ class TrendingManagerMixin:
             return 0
 
         deleted = 0
-        for item in self.trending_dynamo.generate_items():
+        # only keys and scores are needed here, so save response bytes with a projected query
+        for item in self.trending_dynamo.generate_keys():
             item_id = item['partitionKey'].split('/')[1]
             current_score = item['gsiA4SortKey']
             if current_score >= self.min_score_to_keep:
@@ -47,7 +47,10 @@ class TrendingModelMixin:
 
         if self.trending_item:
             try:
-                self._trending_item = self.trending_dynamo.add_score(self.id, inflated_score, last_deflated_at)
+                # pass the stored string through as-is, avoiding a re-format of last_deflated_at
+                self._trending_item = self.trending_dynamo.add_score(
+                    self.id, inflated_score, self.trending_item['lastDeflatedAt']
+                )
             except TrendingDNEOrAttributeMismatch:
                 pass
             else:
@@ -1,8 +1,10 @@
 from decimal import Decimal
+from unittest.mock import Mock, patch
 from uuid import uuid4
 
 import pendulum
 import pytest
+from botocore.exceptions import ClientError
 
 from app.mixins.trending.dynamo import TrendingDynamo
 from app.mixins.trending.exceptions import TrendingAlreadyExists, TrendingDNEOrAttributeMismatch
@@ -38,6 +40,7 @@ def test_add(trending_dynamo):
     assert pendulum.parse(item.pop('createdAt')) == now
     assert item.pop('gsiA4PartitionKey').split('/') == ['itype', 'trending']
     assert item.pop('gsiA4SortKey') == 42
+    assert item.pop('clientToken')
     assert item == {}
 
     # verify we can't add another trending for the same item
@@ -70,9 +73,12 @@ def test_add_score_failures(trending_dynamo):
         trending_dynamo.add_score(item_id, Decimal(99), pendulum.now('utc'))
 
     # verify can't add to trending with treding last deflated at mismatch
-    trending_dynamo.add(item_id, Decimal(42), now=pendulum.now('utc'))
-    with pytest.raises(TrendingDNEOrAttributeMismatch, match=f'itype:{item_id}'):
+    lda = pendulum.now('utc')
+    trending_dynamo.add(item_id, Decimal(42), now=lda)
+    with pytest.raises(TrendingDNEOrAttributeMismatch, match=f'itype:{item_id}') as exc_info:
         trending_dynamo.add_score(item_id, Decimal(99), pendulum.now('utc'))
+    assert exc_info.value.attribute_name == 'lastDeflatedAt'
+    assert exc_info.value.actual_value == lda.to_iso8601_string()
 
 
 def test_add_score_success(trending_dynamo):
@@ -88,6 +94,7 @@ def test_add_score_success(trending_dynamo):
     new_item = trending_dynamo.get(item_id)
     assert new_item['gsiA4SortKey'] == 42 + 17
     item['gsiA4SortKey'] = new_item['gsiA4SortKey']
+    item['lastWriteToken'] = new_item['lastWriteToken']
     assert new_item == item
 
     # verify we can add a float to its score
@@ -95,9 +102,72 @@ def test_add_score_success(trending_dynamo):
     new_item = trending_dynamo.get(item_id)
     assert new_item['gsiA4SortKey'] == pytest.approx(Decimal(42 + 17 + 1 / 6))
     item['gsiA4SortKey'] = new_item['gsiA4SortKey']
+    item['lastWriteToken'] = new_item['lastWriteToken']
     assert new_item == item
 
 
+def test_add_idempotent_when_response_lost(trending_dynamo):
+    item_id = str(uuid4())
+    org_add_item = trending_dynamo.client.add_item
+
+    # simulate the write succeeding server-side but the response getting lost,
+    # so the client-side retry hits the condition expression
+    def add_item_response_lost(query_kwargs):
+        org_add_item(query_kwargs)
+        raise trending_dynamo.client.exceptions.ConditionalCheckFailedException(
+            {'Error': {'Code': 'ConditionalCheckFailedException'}}, 'PutItem'
+        )
+
+    trending_dynamo.client.add_item = add_item_response_lost
+    item = trending_dynamo.add(item_id, Decimal(42))
+    trending_dynamo.client.add_item = org_add_item
+    assert item == trending_dynamo.get(item_id)
+    assert item['gsiA4SortKey'] == 42
+
+
+def test_add_score_idempotent_when_response_lost(trending_dynamo):
+    item_id = str(uuid4())
+    now = pendulum.now('utc')
+    trending_dynamo.add(item_id, Decimal(42), now=now)
+    org_update_item = trending_dynamo.client.update_item
+
+    # simulate the write succeeding server-side but the response getting lost
+    def update_item_response_lost(query_kwargs):
+        org_update_item(query_kwargs)
+        raise trending_dynamo.client.exceptions.ConditionalCheckFailedException(
+            {'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem'
+        )
+
+    trending_dynamo.client.update_item = update_item_response_lost
+    item = trending_dynamo.add_score(item_id, Decimal(17), now)
+    trending_dynamo.client.update_item = org_update_item
+    assert item == trending_dynamo.get(item_id)
+    assert item['gsiA4SortKey'] == 42 + 17
+
+
+def test_add_score_retries_when_throttled(trending_dynamo):
+    item_id = str(uuid4())
+    now = pendulum.now('utc')
+    trending_dynamo.add(item_id, Decimal(42), now=now)
+
+    # mock the client so the first two writes get throttled, then recover
+    throttled_err = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'UpdateItem')
+    org_update_item = trending_dynamo.client.update_item
+    with patch('app.mixins.trending.dynamo.time.sleep') as sleep_mock:
+        trending_dynamo.client.update_item = Mock(side_effect=[throttled_err, throttled_err, 'the-item'])
+        assert trending_dynamo.add_score(item_id, Decimal(1), now) == 'the-item'
+    assert sleep_mock.call_count == 2
+    assert trending_dynamo.client.update_item.call_count == 3
+
+    # verify we give up after the max number of attempts
+    with patch('app.mixins.trending.dynamo.time.sleep') as sleep_mock:
+        trending_dynamo.client.update_item = Mock(side_effect=throttled_err)
+        with pytest.raises(ClientError):
+            trending_dynamo.add_score(item_id, Decimal(1), now)
+    assert trending_dynamo.client.update_item.call_count == 5
+    trending_dynamo.client.update_item = org_update_item
+
+
 def test_deflate_score_failures(trending_dynamo):
     item_id = str(uuid4())
     now = pendulum.now('utc')
@@ -235,3 +305,23 @@ def test_generate_items(trending_dynamo, trending_dynamo_itype2):
     # test generate three, in correct order
     item3 = trending_dynamo.add(str(uuid4()), Decimal(40))
     assert list(trending_dynamo.generate_items()) == [item3, item1, item2]
+
+
+def test_generate_keys(trending_dynamo, trending_dynamo_itype2):
+    # add a distraction
+    trending_dynamo_itype2.add(str(uuid4()), Decimal(42))
+
+    # test generate none
+    assert list(trending_dynamo.generate_keys()) == []
+
+    # test generate two, in correct order, with only key attributes
+    item1 = trending_dynamo.add(str(uuid4()), Decimal(42))
+    item2 = trending_dynamo.add(str(uuid4()), Decimal(40))
+    keys = list(trending_dynamo.generate_keys())
+    assert len(keys) == 2
+    for key, item in zip(keys, [item2, item1]):
+        assert key.pop('partitionKey') == item['partitionKey']
+        assert key.pop('sortKey') == item['sortKey']
+        assert key.pop('gsiA4PartitionKey') == item['gsiA4PartitionKey']
+        assert key.pop('gsiA4SortKey') == item['gsiA4SortKey']
+        assert key == {}
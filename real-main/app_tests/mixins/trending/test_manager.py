@@ -126,10 +126,11 @@ def test_trending_deflate_item_with_recursion(manager, caplog):
     with caplog.at_level(logging.WARNING):
         deflated = manager.trending_deflate_item(item, now=now)
     assert deflated is True
-    assert len(caplog.records) == 1
-    assert 'trying again' in caplog.records[0].msg
-    assert manager.item_type in caplog.records[0].msg
-    assert item_id in caplog.records[0].msg
+    assert len(caplog.records) == 2
+    assert 'conditional failure' in caplog.records[0].msg
+    assert 'trying again' in caplog.records[1].msg
+    assert manager.item_type in caplog.records[1].msg
+    assert item_id in caplog.records[1].msg
 
     # verify it was deflated correctly
     item = manager.trending_dynamo.get(item_id)
@@ -208,8 +209,8 @@ def test_trending_delete_tail_race_condition(manager, caplog):
     manager.trending_dynamo.add(item2_id, item2_score, now=item2_lda)
 
     # mock the generator so we can make a race condition
-    items = list(manager.trending_dynamo.generate_items())
-    manager.trending_dynamo.generate_items = Mock(return_value=(i for i in items))
+    items = list(manager.trending_dynamo.generate_keys())
+    manager.trending_dynamo.generate_keys = Mock(return_value=(i for i in items))
 
     # add more score to one of them to create the rce condition
     manager.trending_dynamo.add_score(item2_id, Decimal(1), item2_lda)
@@ -218,9 +219,10 @@ def test_trending_delete_tail_race_condition(manager, caplog):
     with caplog.at_level(logging.WARNING):
         cnt = manager.trending_delete_tail(10002)
     assert cnt == 1
-    assert len(caplog.records) == 1
-    assert 'not deleting trending' in caplog.records[0].msg
-    assert item2_id in caplog.records[0].msg
+    assert len(caplog.records) == 2
+    assert 'conditional failure' in caplog.records[0].msg
+    assert 'not deleting trending' in caplog.records[1].msg
+    assert item2_id in caplog.records[1].msg
 
     assert manager.trending_dynamo.delete.mock_calls == [
         call(item2_id, expected_score=pytest.approx(item2_score)),  # calls, but fails
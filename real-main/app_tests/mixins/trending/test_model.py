@@ -101,8 +101,9 @@ def test_increment_score_update_existing_race_condition_deflation(model, caplog)
     now = pendulum.parse('2020-06-09T02:00:00Z')
     with caplog.at_level(logging.WARNING):
         model.trending_increment_score(now=now)
-    assert len(caplog.records) == 1
-    assert 'retry 1' in caplog.records[0].msg
+    assert len(caplog.records) == 2
+    assert 'conditional failure' in caplog.records[0].msg
+    assert 'retry 1' in caplog.records[1].msg
     assert model.trending_item['gsiA4SortKey'] == pytest.approx(new_score + Decimal(2 ** (1 / 12)))
 
 
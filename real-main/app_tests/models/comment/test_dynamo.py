@@ -1,16 +1,30 @@
 import logging
 from uuid import uuid4
 
+import moto
 import pendulum
 import pytest
 
+from app import clients
 from app.models.comment.dynamo import CommentDynamo
 from app.models.comment.exceptions import CommentAlreadyExists
 
+from ...dynamodb.table_schema import main_table_schema
 
-@pytest.fixture
-def comment_dynamo(dynamo_client):
-    yield CommentDynamo(dynamo_client)
+
+# module-scoped so the mocked table isn't torn down and recreated for every test
+@pytest.fixture(scope='module')
+def comment_dynamo():
+    with moto.mock_dynamodb2():
+        dynamo_client = clients.DynamoClient(table_name='main-table', create_table_schema=main_table_schema)
+        yield CommentDynamo(dynamo_client)
+
+
+@pytest.fixture(autouse=True)
+def truncate_table(comment_dynamo):
+    yield
+    client = comment_dynamo.client
+    client.batch_delete_items(client.generate_all_scan({}))
 
 
 def test_add_comment(comment_dynamo):
@@ -69,9 +69,9 @@ def test_forced_delete(comment, comment2, user):
 def test_only_post_owner_and_comment_owner_can_delete_a_comment(
     post_manager, comment_manager, user, user2, user3
 ):
-    post = post_manager.add_post(user, 'pid2', PostType.TEXT_ONLY, text='go go')
-    comment1 = comment_manager.add_comment('cid1', post.id, user2.id, 'run far')
-    comment2 = comment_manager.add_comment('cid2', post.id, user2.id, 'run far')
+    post = post_manager.add_post(user, str(uuid.uuid4()), PostType.TEXT_ONLY, text='go go')
+    comment1 = comment_manager.add_comment(str(uuid.uuid4()), post.id, user2.id, 'run far')
+    comment2 = comment_manager.add_comment(str(uuid.uuid4()), post.id, user2.id, 'run far')
 
     # verify user3 (a rando) cannot delete either of the comments
     with pytest.raises(CommentException, match='not authorized to delete'):